@@ -1,8 +1,14 @@
 import streamlit as st
 import pandas as pd
 import os
+import glob
+import fcntl
+import functools
+import threading
+import gzip
+import json
 import base64
-from datetime import datetime
+from datetime import datetime, time, timedelta
 import plotly.express as px
 from PIL import Image
 import io
@@ -24,31 +30,36 @@ if 'current_view' not in st.session_state:
 # Constants
 CSV_PATH = "data/inventory.csv"
 IMAGES_FOLDER = "data/images"
+SALES_FOLDER = "data/sales"
+SALES_INDEX_PATH = "data/sales/index.csv"
+SALES_LOCK_PATH = "data/sales/.lock"
+SNAPSHOTS_FOLDER = "data/snapshots"
+
+# Snapshot policy: a new compressed base is taken when the change log outgrows the
+# current base (once past a minimum size) or the base gets too old; restore points
+# are kept for SNAPSHOT_RETENTION_DAYS, and bases pinned before an import are never removed
+SNAPSHOT_MAX_AGE_DAYS = 7
+SNAPSHOT_MIN_LOG_SIZE = 1024 * 1024
+SNAPSHOT_RETENTION_DAYS = 90
+SNAPSHOT_TIMESTAMP_FORMAT = "%Y%m%d%H%M%S%f"
+
+# Inventory columns (shared by the live catalog and the sales history)
+INVENTORY_COLUMNS = [
+    'truck_id', 'brand', 'model', 'year', 'mileage', 'truck_type', 'transmission', 'engine',
+    'features', 'condition', 'status', 'price', 'upload_date', 'sale_date', 'sales_person', 'photo_path'
+]
+
+# Sales rollup granularities, as the length of the ISO sale_date prefix they group by
+ROLLUP_PERIODS = {'day': 10, 'month': 7, 'year': 4}
 
 # Ensure directories exist
 os.makedirs(IMAGES_FOLDER, exist_ok=True)
+os.makedirs(SNAPSHOTS_FOLDER, exist_ok=True)
 os.makedirs(os.path.dirname(CSV_PATH), exist_ok=True)
 
 # Create inventory file if it doesn't exist
 if not os.path.exists(CSV_PATH):
-    initial_data = pd.DataFrame({
-        'truck_id': [],
-        'brand': [],
-        'model': [],
-        'year': [],
-        'mileage': [],
-        'truck_type': [],
-        'transmission': [],
-        'engine': [],
-        'features': [],
-        'condition': [],
-        'status': [],
-        'price': [],
-        'upload_date': [],
-        'sale_date': [],
-        'sales_person': [],
-        'photo_path': []
-    })
+    initial_data = pd.DataFrame(columns=INVENTORY_COLUMNS)
     initial_data.to_csv(CSV_PATH, index=False)
 
 # Load logo
@@ -69,9 +80,308 @@ def authenticate(username, password):
     
     return username == correct_username and password == correct_password
 
-# Save data to CSV
-def save_data(df):
-    df.to_csv(CSV_PATH, index=False)
+# Write a CSV atomically, so readers never see a half-written file
+def write_csv(df, path, **kwargs):
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    df.to_csv(temp_path, index=False, **kwargs)
+    os.replace(temp_path, path)
+
+# Save data to CSV (sold trucks are moved to the sales history); changed_ids are the
+# trucks this save added, edited or removed, so only their rows are logged for backup
+def save_data(df, changed_ids=None):
+    sold = df['status'] == 'Vendido'
+    if sold.any():
+        archive_sales(df[sold])
+    
+    # Bulk saves (import, restore) are diffed against the file they replace
+    previous = pd.read_csv(CSV_PATH) if changed_ids is None and os.path.exists(CSV_PATH) else None
+    live = df[~sold]
+    write_csv(live, CSV_PATH)
+    
+    # Log the change against the latest snapshot
+    record_snapshot_changes(live, changed_ids, previous)
+    load_data.clear()
+
+# Snapshot base (compressed full copy) paths, oldest first
+def list_snapshots():
+    return sorted(glob.glob(os.path.join(SNAPSHOTS_FOLDER, '*.csv.gz')))
+
+# Timestamp of a snapshot base
+def snapshot_time(path):
+    return datetime.strptime(os.path.basename(path).split('.')[0], SNAPSHOT_TIMESTAMP_FORMAT)
+
+# Change log path of a snapshot base
+def snapshot_log_path(path):
+    return path.replace('.csv.gz', '.log.gz')
+
+# Take a new compressed base snapshot (live inventory plus sales history) and apply the retention policy
+def take_snapshot(df, pinned=False):
+    suffix = ".pinned.csv.gz" if pinned else ".csv.gz"
+    path = os.path.join(SNAPSHOTS_FOLDER, f"{datetime.now().strftime(SNAPSHOT_TIMESTAMP_FORMAT)}{suffix}")
+    write_csv(pd.concat([df, load_sales()], ignore_index=True), path, compression='gzip')
+    
+    # The newest base before the cutoff is kept, since restore points inside the window replay from it
+    cutoff = datetime.now() - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+    expired = [old_path for old_path in list_snapshots() if snapshot_time(old_path) < cutoff]
+    for old_path in expired[:-1]:
+        if old_path.endswith(".pinned.csv.gz"):
+            continue
+        os.remove(old_path)
+        if os.path.exists(snapshot_log_path(old_path)):
+            os.remove(snapshot_log_path(old_path))
+
+# Append a change to one store ('inventory' or 'sales') to the log of the latest snapshot
+def log_snapshot_change(store, deleted, upserted):
+    snapshots = list_snapshots()
+    if not snapshots:
+        return
+    
+    record = {
+        'timestamp': datetime.now().isoformat(),
+        'store': store,
+        'deleted': [str(truck_id) for truck_id in deleted],
+        'upserted': json.loads(upserted.to_json(orient='records'))
+    }
+    # Each append is its own gzip member, so the cost is proportional to the change
+    with gzip.open(snapshot_log_path(snapshots[-1]), 'at', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+
+# Log the rows of the given trucks, or the rows that differ from the previous inventory
+def record_snapshot_changes(current, changed_ids=None, previous=None):
+    snapshots = list_snapshots()
+    if not snapshots or (changed_ids is None and (previous is None or list(previous.columns) != list(current.columns))):
+        take_snapshot(current)
+        return
+    
+    base_path = snapshots[-1]
+    log_path = snapshot_log_path(base_path)
+    if (datetime.now() - snapshot_time(base_path)).days >= SNAPSHOT_MAX_AGE_DAYS or (
+            os.path.exists(log_path) and os.path.getsize(log_path) > max(os.path.getsize(base_path), SNAPSHOT_MIN_LOG_SIZE)):
+        take_snapshot(current)
+        return
+    
+    if changed_ids is not None:
+        # Only the trucks this save touched; the ones no longer live were deleted or sold
+        changed_ids = [str(truck_id) for truck_id in changed_ids]
+        upserted = current[current['truck_id'].astype(str).isin(changed_ids)]
+        deleted = sorted(set(changed_ids) - set(upserted['truck_id'].astype(str)))
+        log_snapshot_change('inventory', deleted, upserted)
+        return
+    
+    old = previous.set_index('truck_id').astype(str)
+    new = current.set_index('truck_id').astype(str)
+    deleted = old.index.difference(new.index)
+    common = new.index.intersection(old.index)
+    changed = new.index.difference(old.index).union(common[(new.loc[common] != old.loc[common]).any(axis=1)])
+    
+    if not deleted.empty or not changed.empty:
+        log_snapshot_change('inventory', deleted, current[current['truck_id'].isin(changed)])
+
+# Rebuild the live inventory and the sales history as they were at a point in time
+# (None if older than every snapshot)
+def restore_snapshot(target_time):
+    snapshots = [path for path in list_snapshots() if snapshot_time(path) <= target_time]
+    if not snapshots:
+        return None
+    
+    # Replay only the log of the latest base before the target
+    base_path = snapshots[-1]
+    df = pd.read_csv(base_path)
+    stores = {'inventory': df[df['status'] != 'Vendido'], 'sales': df[df['status'] == 'Vendido']}
+    log_path = snapshot_log_path(base_path)
+    if os.path.exists(log_path):
+        with gzip.open(log_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if datetime.fromisoformat(record['timestamp']) > target_time:
+                    break
+                
+                store = stores[record['store']]
+                upserted = pd.DataFrame(record['upserted'], columns=store.columns)
+                truck_ids = store['truck_id'].astype(str)
+                store = store[~truck_ids.isin(record['deleted']) & ~truck_ids.isin(upserted['truck_id'].astype(str))]
+                stores[record['store']] = pd.concat([store, upserted], ignore_index=True)
+    return stores['inventory'], stores['sales']
+
+# Sales history partition path (one CSV per month of sale)
+def sales_partition_path(sale_date):
+    return os.path.join(SALES_FOLDER, sale_date[:4], f"{sale_date[:7]}.csv")
+
+# Months ('YYYY-MM') covered by a date range
+def months_in_range(start_date, end_date):
+    months = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        months.append(f"{year:04d}-{month:02d}")
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return months
+
+# Load a single sales partition (cache is invalidated when the file changes; old
+# versions are evicted once ten years of monthly partitions are cached)
+@st.cache_data(max_entries=120)
+def load_sales_partition(path, mtime):
+    return pd.read_csv(path)
+
+# Load sold trucks, reading only the partitions inside the date range
+def load_sales(start_date=None, end_date=None):
+    if start_date is None or end_date is None:
+        paths = sorted(glob.glob(os.path.join(SALES_FOLDER, '*', '*.csv')))
+    else:
+        paths = [sales_partition_path(month) for month in months_in_range(start_date, end_date)]
+    
+    frames = [load_sales_partition(path, os.path.getmtime(path)) for path in paths if os.path.exists(path)]
+    if not frames:
+        return pd.DataFrame(columns=INVENTORY_COLUMNS)
+    
+    sales = pd.concat(frames, ignore_index=True)
+    if start_date is not None and end_date is not None:
+        # sale_date is stored as ISO text, so plain string comparison is enough
+        sales = sales[(sales['sale_date'] >= start_date.isoformat()) & (sales['sale_date'] <= end_date.isoformat())]
+    return sales
+
+# Sales history writers hold an exclusive file lock, so concurrent sessions cannot lose updates
+sales_lock_state = threading.local()
+
+def sales_writer(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Re-entrant: writers calling other writers already hold the lock
+        if getattr(sales_lock_state, 'held', False):
+            return func(*args, **kwargs)
+        
+        os.makedirs(SALES_FOLDER, exist_ok=True)
+        with open(SALES_LOCK_PATH, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            sales_lock_state.held = True
+            try:
+                return func(*args, **kwargs)
+            finally:
+                sales_lock_state.held = False
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return wrapper
+
+# Rollup file path ('day', 'month' or 'year')
+def rollup_path(period):
+    return os.path.join(SALES_FOLDER, f"rollup_{period}.csv")
+
+# Load revenue/units rollup (rebuilt from the partitions if missing)
+def load_rollup(period):
+    if not os.path.exists(rollup_path(period)):
+        rebuild_rollups()
+    return pd.read_csv(rollup_path(period), dtype={'period': str})
+
+# Units and revenue of sold trucks grouped by a sale_date prefix
+def group_sales(sales, width):
+    return pd.DataFrame({
+        'period': sales['sale_date'].astype(str).str[:width],
+        'units': 1,
+        'revenue': pd.to_numeric(sales['price'], errors='coerce').fillna(0)
+    }).groupby('period').sum()
+
+# Recompute every rollup from the sales partitions
+@sales_writer
+def rebuild_rollups():
+    sales = load_sales()
+    for period, width in ROLLUP_PERIODS.items():
+        write_csv(group_sales(sales, width).sort_index().reset_index(), rollup_path(period))
+
+# Add (sign=1) or remove (sign=-1) sold trucks from every rollup
+@sales_writer
+def update_rollups(sales, sign=1):
+    if sales.empty:
+        return
+    
+    # The partitions already hold this change, so a missing rollup is simply rebuilt
+    if not all(os.path.exists(rollup_path(period)) for period in ROLLUP_PERIODS):
+        rebuild_rollups()
+        return
+    
+    for period, width in ROLLUP_PERIODS.items():
+        rollup = load_rollup(period).set_index('period').add(group_sales(sales, width) * sign, fill_value=0)
+        rollup = rollup[rollup['units'] > 0].sort_index().reset_index()
+        rollup['units'] = rollup['units'].astype(int)
+        write_csv(rollup, rollup_path(period))
+
+# Sale date of every truck in the sales history (rebuilt from the partitions if missing)
+def load_sales_index():
+    if os.path.exists(SALES_INDEX_PATH):
+        return pd.read_csv(SALES_INDEX_PATH, dtype=str)
+    return load_sales()[['truck_id', 'sale_date']].astype(str)
+
+# Append sold trucks to their monthly partitions
+@sales_writer
+def archive_sales(sold):
+    sold = sold.reindex(columns=INVENTORY_COLUMNS).drop_duplicates('truck_id', keep='last')
+    sold['status'] = 'Vendido'
+    sale_dates = pd.to_datetime(sold['sale_date'], errors='coerce').fillna(pd.Timestamp(datetime.now().date()))
+    sold['sale_date'] = sale_dates.dt.strftime("%Y-%m-%d")
+    
+    # Trucks already in the sales history are replaced, not counted twice
+    index = load_sales_index()
+    for _, sale in index[index['truck_id'].isin(sold['truck_id'].astype(str))].iterrows():
+        remove_sale(sale['truck_id'], sale['sale_date'])
+    
+    for month, partition in sold.groupby(sold['sale_date'].str[:7]):
+        path = sales_partition_path(month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            partition = pd.concat([pd.read_csv(path), partition], ignore_index=True)
+        write_csv(partition, path)
+    
+    update_rollups(sold)
+    # Reuse the index read above (a reload could rebuild it from partitions that already hold these sales)
+    sold_index = sold[['truck_id', 'sale_date']].astype(str)
+    write_csv(pd.concat([index[~index['truck_id'].isin(sold_index['truck_id'])], sold_index]), SALES_INDEX_PATH)
+    log_snapshot_change('sales', [], sold)
+
+# Remove a sold truck from the sales history and return its record
+@sales_writer
+def remove_sale(truck_id, sale_date):
+    path = sales_partition_path(sale_date)
+    partition = pd.read_csv(path)
+    matches = partition['truck_id'].astype(str) == str(truck_id)
+    removed = partition[matches]
+    write_csv(partition[~matches], path)
+    update_rollups(removed, sign=-1)
+    
+    index = load_sales_index()
+    write_csv(index[index['truck_id'] != str(truck_id)], SALES_INDEX_PATH)
+    log_snapshot_change('sales', [truck_id], removed.iloc[:0])
+    return removed
+
+# Load one sold truck from the sales history (None if it is not there)
+def load_sale(truck_id):
+    index = load_sales_index()
+    sale = index[index['truck_id'] == str(truck_id)]
+    if sale.empty:
+        return None
+    
+    partition = pd.read_csv(sales_partition_path(sale['sale_date'].iloc[0]))
+    return partition[partition['truck_id'].astype(str) == str(truck_id)].iloc[0].to_dict()
+
+# Make the sales history match the given sold trucks
+@sales_writer
+def replace_sales(sales):
+    index = load_sales_index()
+    sales_ids = sales['truck_id'].astype(str)
+    for _, sale in index[~index['truck_id'].isin(sales_ids)].iterrows():
+        remove_sale(sale['truck_id'], sale['sale_date'])
+    
+    # Sales already recorded with the same date are left alone
+    unchanged = index.merge(sales[['truck_id', 'sale_date']].astype(str))['truck_id']
+    if not sales_ids.isin(unchanged).all():
+        archive_sales(sales[~sales_ids.isin(unchanged)])
+
+# Take the first snapshot of the existing inventory
+if not list_snapshots():
+    take_snapshot(pd.read_csv(CSV_PATH))
+
+# Move sold trucks out of the live catalog on first run with the sales history
+if not os.path.exists(SALES_FOLDER):
+    os.makedirs(SALES_FOLDER)
+    save_data(pd.read_csv(CSV_PATH))
 
 # Save image function
 def save_image(image_file, truck_id):
@@ -337,7 +647,7 @@ def inventory_management():
     # Load data
     df = load_data()
     
-    if df.empty:
+    if df.empty and load_rollup('year').empty:
         st.info("Não há caminhões no inventário. Adicione seu primeiro caminhão!")
         return
     
@@ -345,20 +655,35 @@ def inventory_management():
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        statuses = ['Todos'] + sorted(df['status'].unique().tolist())
+        statuses = ['Todos (exceto vendidos)'] + sorted(set(df['status'].unique().tolist()) | {'Vendido'})
         selected_status = st.selectbox('Status', statuses)
     
+    # Sold trucks live in the sales history, not in the inventory file
+    if selected_status == 'Vendido':
+        today = datetime.now().date()
+        col4, col5 = st.columns(2)
+        
+        with col4:
+            sold_start = st.date_input("Vendidos a partir de", value=today - timedelta(days=90), max_value=today, key='inv_sold_start')
+        
+        with col5:
+            sold_end = st.date_input("Vendidos até", value=today, max_value=today, key='inv_sold_end')
+        
+        source_df = load_sales(sold_start, sold_end)
+    else:
+        source_df = df
+    
     with col2:
-        brands = ['Todos'] + sorted(df['brand'].unique().tolist())
+        brands = ['Todos'] + sorted(source_df['brand'].unique().tolist())
         selected_brand = st.selectbox('Marca', brands, key='inv_brand')
         
     with col3:
-        years = ['Todos'] + sorted(df['year'].unique().tolist(), reverse=True)
+        years = ['Todos'] + sorted(source_df['year'].unique().tolist(), reverse=True)
         selected_year = st.selectbox('Ano', years, key='inv_year')
     
     # Apply filters
-    filtered_df = df.copy()
-    if selected_status != 'Todos':
+    filtered_df = source_df.copy()
+    if selected_status != 'Todos (exceto vendidos)':
         filtered_df = filtered_df[filtered_df['status'] == selected_status]
     if selected_brand != 'Todos':
         filtered_df = filtered_df[filtered_df['brand'] == selected_brand]
@@ -400,15 +725,23 @@ def inventory_management():
                             # Update status
                             df.loc[df['truck_id'] == truck['truck_id'], 'status'] = 'Vendido'
                             df.loc[df['truck_id'] == truck['truck_id'], 'sale_date'] = datetime.now().strftime("%Y-%m-%d")
-                            save_data(df)
+                            save_data(df, [truck['truck_id']])
                             st.success("Caminhão marcado como vendido!")
                             st.experimental_rerun()
+                    elif truck['status'] == 'Vendido':
+                        if st.button(f"Marcar como Disponível", key=f"avail_{truck['truck_id']}"):
+                            # Move back from the sales history
+                            restored = remove_sale(truck['truck_id'], truck['sale_date'])
+                            restored = restored.assign(status='Disponível', sale_date=None)
+                            save_data(pd.concat([df, restored], ignore_index=True), [truck['truck_id']])
+                            st.success("Caminhão marcado como disponível!")
+                            st.experimental_rerun()
                     else:
                         if st.button(f"Marcar como Disponível", key=f"avail_{truck['truck_id']}"):
                             # Update status
                             df.loc[df['truck_id'] == truck['truck_id'], 'status'] = 'Disponível'
                             df.loc[df['truck_id'] == truck['truck_id'], 'sale_date'] = None
-                            save_data(df)
+                            save_data(df, [truck['truck_id']])
                             st.success("Caminhão marcado como disponível!")
                             st.experimental_rerun()
                 
@@ -416,6 +749,7 @@ def inventory_management():
                     if st.button(f"Excluir", key=f"delete_{truck['truck_id']}"):
                         # Delete confirmation
                         st.session_state.delete_truck_id = truck['truck_id']
+                        st.session_state.delete_sale_date = truck['sale_date'] if truck['status'] == 'Vendido' else None
                         st.session_state.show_delete_confirmation = True
             
             st.markdown("---")
@@ -430,12 +764,18 @@ def inventory_management():
                 # Delete truck
                 truck_id = st.session_state.delete_truck_id
                 
-                # Get photo path to delete
-                photo_path = df.loc[df['truck_id'] == truck_id, 'photo_path'].values[0]
+                sale_date = st.session_state.get('delete_sale_date')
                 
-                # Remove from dataframe
-                df = df[df['truck_id'] != truck_id]
-                save_data(df)
+                if sale_date:
+                    # Remove from sales history
+                    photo_path = remove_sale(truck_id, sale_date)['photo_path'].values[0]
+                else:
+                    # Get photo path to delete
+                    photo_path = df.loc[df['truck_id'] == truck_id, 'photo_path'].values[0]
+                    
+                    # Remove from dataframe
+                    df = df[df['truck_id'] != truck_id]
+                    save_data(df, [truck_id])
                 
                 # Delete photo if it exists
                 if pd.notna(photo_path) and os.path.exists(photo_path):
@@ -446,6 +786,7 @@ def inventory_management():
                 # Reset state
                 del st.session_state.show_delete_confirmation
                 del st.session_state.delete_truck_id
+                del st.session_state.delete_sale_date
                 
                 st.experimental_rerun()
         
@@ -454,6 +795,7 @@ def inventory_management():
                 # Reset state
                 del st.session_state.show_delete_confirmation
                 del st.session_state.delete_truck_id
+                del st.session_state.delete_sale_date
                 st.experimental_rerun()
 
 # Add/Edit truck view
@@ -465,6 +807,7 @@ def add_truck():
     
     # Check if we're editing
     editing = False
+    editing_sale = False
     truck_data = {}
     
     if hasattr(st.session_state, 'edit_truck_id'):
@@ -472,6 +815,12 @@ def add_truck():
         if truck_id in df['truck_id'].values:
             editing = True
             truck_data = df[df['truck_id'] == truck_id].iloc[0].to_dict()
+        else:
+            # Sold trucks are edited from the sales history
+            sale = load_sale(truck_id)
+            if sale is not None:
+                editing = editing_sale = True
+                truck_data = sale
     
     # Form for adding/editing truck
     with st.form("truck_form"):
@@ -515,6 +864,11 @@ def add_truck():
                 upload_date = truck_data['upload_date']
                 sale_date = truck_data['sale_date']
             
+            if status == 'Vendido' and pd.isna(sale_date):
+                sale_date = datetime.now().strftime("%Y-%m-%d")
+            elif status != 'Vendido':
+                sale_date = None
+            
             # Handle image
             photo_path = truck_data.get('photo_path', None)
             if upload_image is not None:
@@ -540,9 +894,15 @@ def add_truck():
                 'photo_path': photo_path
             }
             
-            if editing:
+            if editing_sale:
+                # Sold trucks are re-archived (replacing their sale); otherwise they go back to the inventory
+                if status != 'Vendido':
+                    remove_sale(truck_id, truck_data['sale_date'])
+                df = pd.concat([df, pd.DataFrame([new_data])], ignore_index=True)
+                message = "Caminhão atualizado com sucesso!"
+            elif editing:
                 # Update existing truck
-                df.loc[df['truck_id'] == truck_id] = pd.Series(new_data)
+                df.loc[df['truck_id'] == truck_id, list(new_data.keys())] = list(new_data.values())
                 message = "Caminhão atualizado com sucesso!"
             else:
                 # Add new truck
@@ -550,7 +910,7 @@ def add_truck():
                 message = "Caminhão adicionado com sucesso!"
             
             # Save updated dataframe
-            save_data(df)
+            save_data(df, [truck_id])
             
             st.success(message)
             
@@ -566,65 +926,86 @@ def analytics_view():
     
     # Load data
     df = load_data()
+    daily_rollup = load_rollup('day')
     
-    if df.empty:
+    if df.empty and daily_rollup.empty:
         st.info("Não há dados suficientes para análise. Adicione caminhões ao inventário primeiro.")
         return
     
+    # Date range (only the sales partitions inside it are read)
+    today = datetime.now().date()
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        start_date = st.date_input("Data Inicial", value=today.replace(month=1, day=1), max_value=today)
+    
+    with col2:
+        end_date = st.date_input("Data Final", value=today, max_value=today)
+    
+    if start_date > end_date:
+        st.error("A data inicial deve ser anterior à data final.")
+        return
+    
+    start_str, end_str = start_date.isoformat(), end_date.isoformat()
+    period_rollup = daily_rollup[(daily_rollup['period'] >= start_str) & (daily_rollup['period'] <= end_str)]
+    
     # Summary statistics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total de Caminhões", len(df))
+        st.metric("Total de Caminhões", len(df) + int(load_rollup('year')['units'].sum()))
     
     with col2:
         available_count = len(df[df['status'] == 'Disponível'])
         st.metric("Caminhões Disponíveis", available_count)
     
     with col3:
-        sold_count = len(df[df['status'] == 'Vendido'])
-        st.metric("Caminhões Vendidos", sold_count)
+        st.metric("Caminhões Vendidos no Período", int(period_rollup['units'].sum()))
     
     with col4:
-        if 'price' in df.columns and 'status' in df.columns:
-            sold_df = df[df['status'] == 'Vendido']
-            if not sold_df.empty:
-                total_sales = sold_df['price'].sum()
-                st.metric("Valor Total de Vendas", f"R$ {total_sales:,.2f}".replace(',', '.'))
-            else:
-                st.metric("Valor Total de Vendas", "R$ 0,00")
+        if not period_rollup.empty:
+            total_sales = period_rollup['revenue'].sum()
+            st.metric("Valor Total de Vendas", f"R$ {total_sales:,.2f}".replace(',', '.'))
+        else:
+            st.metric("Valor Total de Vendas", "R$ 0,00")
     
     st.markdown("---")
     
     # More detailed analytics
-    if len(df) > 1:
+    sold_df = load_sales(start_date, end_date)
+    combined_df = pd.concat([df, sold_df], ignore_index=True)
+    
+    if len(combined_df) > 1:
         # Truck brands distribution
         st.subheader("Distribuição por Marca")
-        brand_counts = df['brand'].value_counts().reset_index()
+        brand_counts = combined_df['brand'].value_counts().reset_index()
         brand_counts.columns = ['Marca', 'Quantidade']
         fig = px.bar(brand_counts, x='Marca', y='Quantidade', color='Marca')
         st.plotly_chart(fig, use_container_width=True)
         
         # Status distribution
         st.subheader("Distribuição por Status")
-        status_counts = df['status'].value_counts().reset_index()
+        status_counts = combined_df['status'].value_counts().reset_index()
         status_counts.columns = ['Status', 'Quantidade']
         fig = px.pie(status_counts, names='Status', values='Quantidade')
         st.plotly_chart(fig, use_container_width=True)
         
-        # Sales by month (if there are sold trucks)
-        sold_df = df[df['status'] == 'Vendido'].copy()
-        if not sold_df.empty and 'sale_date' in sold_df.columns:
-            st.subheader("Vendas por Mês")
+        # Sales over time (if there are sold trucks)
+        if not sold_df.empty:
+            st.subheader("Vendas por Período")
             
-            # Convert sale_date to datetime
-            sold_df['sale_date'] = pd.to_datetime(sold_df['sale_date'])
-            sold_df['month'] = sold_df['sale_date'].dt.strftime('%Y-%m')
+            periods = {"Dia": 'day', "Mês": 'month', "Ano": 'year'}
+            selected_period = periods[st.radio("Agrupar por", list(periods.keys()), index=1, horizontal=True)]
             
-            monthly_sales = sold_df.groupby('month')['price'].sum().reset_index()
-            monthly_sales.columns = ['Mês', 'Valor Total']
+            # Rollup rows whose period overlaps the selected range
+            width = ROLLUP_PERIODS[selected_period]
+            rollup = load_rollup(selected_period)
+            rollup = rollup[(rollup['period'] >= start_str[:width]) & (rollup['period'] <= end_str[:width])]
             
-            fig = px.line(monthly_sales, x='Mês', y='Valor Total', markers=True)
+            period_sales = rollup[['period', 'revenue', 'units']]
+            period_sales.columns = ['Período', 'Valor Total', 'Quantidade Vendida']
+            
+            fig = px.line(period_sales, x='Período', y='Valor Total', markers=True, hover_data=['Quantidade Vendida'])
             st.plotly_chart(fig, use_container_width=True)
             
             # Sales by vendor
@@ -652,8 +1033,8 @@ def settings_view():
     
     st.subheader("Exportar Dados")
     
-    # Load data
-    df = load_data()
+    # Load data (live inventory plus the sales history, so a re-import keeps sold trucks)
+    df = pd.concat([load_data(), load_sales()], ignore_index=True)
     
     if not df.empty:
         csv = df.to_csv(index=False)
@@ -664,6 +1045,12 @@ def settings_view():
             mime="text/csv"
         )
     
+    st.subheader("Totais de Vendas")
+    
+    if st.button("Recalcular Totais de Vendas"):
+        rebuild_rollups()
+        st.success("Totais recalculados a partir do histórico de vendas!")
+    
     st.subheader("Importar Dados")
     
     uploaded_file = st.file_uploader("Carregar arquivo CSV", type=["csv"])
@@ -675,19 +1062,48 @@ def settings_view():
             
             if all(col in imported_df.columns for col in required_columns):
                 if st.button("Confirmar Importação"):
-                    # Backup current data
-                    if os.path.exists(CSV_PATH):
-                        backup_path = f"{CSV_PATH}.bak.{datetime.now().strftime('%Y%m%d%H%M%S')}"
-                        os.rename(CSV_PATH, backup_path)
+                    # Pin a snapshot of the current data, so retention never removes the pre-import state
+                    take_snapshot(pd.read_csv(CSV_PATH), pinned=True)
                     
-                    # Save imported data
-                    imported_df.to_csv(CSV_PATH, index=False)
+                    # Save imported data (the file replaces both the inventory and the sales history)
+                    sold = imported_df['status'] == 'Vendido'
+                    replace_sales(imported_df[sold].reindex(columns=INVENTORY_COLUMNS))
+                    save_data(imported_df[~sold])
                     st.success("Dados importados com sucesso!")
                     st.experimental_rerun()
             else:
                 st.error("O arquivo não contém todas as colunas necessárias.")
         except Exception as e:
             st.error(f"Erro ao importar arquivo: {str(e)}")
+    
+    st.subheader("Restaurar Backup")
+    
+    snapshots = list_snapshots()
+    if snapshots:
+        st.caption(f"Backups disponíveis desde {snapshot_time(snapshots[0]).strftime('%d/%m/%Y %H:%M:%S')}")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            restore_date = st.date_input("Data", value=datetime.now().date(), key='restore_date')
+        
+        with col2:
+            restore_time = st.time_input("Hora", value=time(23, 59), key='restore_time')
+        
+        if st.button("Restaurar Inventário"):
+            restored = restore_snapshot(datetime.combine(restore_date, restore_time))
+            
+            if restored is None:
+                st.error("Não há backup anterior à data selecionada.")
+            else:
+                # Restore the sales history first, so no truck is missing from both stores
+                restored_df, restored_sales = restored
+                replace_sales(restored_sales)
+                save_data(restored_df)
+                st.success("Inventário restaurado com sucesso!")
+                st.experimental_rerun()
+    else:
+        st.info("Nenhum backup disponível.")
 
 # Main app
 def main():
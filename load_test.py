@@ -0,0 +1,301 @@
+# Load test for the Streamlit app
+#
+# Simulates many concurrent sessions (public catalog visitors and admins) against a
+# generated inventory, using Streamlit's AppTest so no server or network is needed.
+#
+#   python load_test.py --sessions 100 --concurrency 16
+#
+# Each session runs in its own new worker process (AppTest sessions are not isolated between
+# threads), in a temporary working directory, so the real data/ folder is never touched.
+# Workers pay for imports and a warm-up run before the session is measured.
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+from PIL import Image
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Public visitors only see the catalog, so run it without the login gate
+VISITOR_SCRIPT = f"""
+import runpy
+app = runpy.run_path({APP_PATH!r})
+app['load_css']()
+app['public_catalog']()
+"""
+
+BRANDS = ['Volvo', 'Scania', 'Mercedes-Benz', 'DAF', 'Iveco', 'Volkswagen', 'Ford']
+TRUCK_TYPES = ['Cavalo Mecânico', 'Truck', 'Toco', 'Bitruck', 'VUC', 'Outro']
+TRANSMISSIONS = ['Manual', 'Automática', 'Automatizada']
+CONDITIONS = ['Novo', 'Seminovo', 'Usado']
+SALES_PEOPLE = ['Rapha', 'Vendedor 2', 'Vendedor 3']
+PERCENTILES = [50, 90, 95, 99]
+
+# Generate a random inventory (with sold trucks spread over the last two years)
+def generate_inventory(workdir, trucks, sold_ratio, seed):
+    rng = random.Random(seed)
+    images_folder = os.path.join(workdir, "data", "images")
+    os.makedirs(images_folder, exist_ok=True)
+    os.makedirs(os.path.join(workdir, "assets"), exist_ok=True)
+
+    # A few shared photos, plus the placeholder the app falls back to
+    photos = []
+    for i in range(5):
+        path = os.path.join("data", "images", f"sample_{i}.jpg")
+        Image.new("RGB", (640, 480), (rng.randrange(256), rng.randrange(256), rng.randrange(256))).save(os.path.join(workdir, path))
+        photos.append(path)
+    Image.new("RGB", (640, 480), (200, 200, 200)).save(os.path.join(workdir, "assets", "truck_placeholder.png"))
+
+    today = datetime.now()
+    rows = []
+    for _ in range(trucks):
+        sold = rng.random() < sold_ratio
+        rows.append({
+            'truck_id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'brand': rng.choice(BRANDS),
+            'model': f"Modelo {rng.randint(1, 20)}",
+            'year': rng.randint(2005, today.year),
+            'mileage': rng.randint(0, 900000),
+            'truck_type': rng.choice(TRUCK_TYPES),
+            'transmission': rng.choice(TRANSMISSIONS),
+            'engine': f"{rng.randint(300, 600)} cv",
+            'features': "Ar condicionado, freio motor",
+            'condition': rng.choice(CONDITIONS),
+            'status': 'Vendido' if sold else rng.choice(['Disponível'] * 8 + ['Em Manutenção', 'Reservado']),
+            'price': float(rng.randint(80, 900) * 1000),
+            'upload_date': (today - timedelta(days=rng.randint(0, 900))).strftime("%Y-%m-%d"),
+            'sale_date': (today - timedelta(days=rng.randint(0, 730))).strftime("%Y-%m-%d") if sold else None,
+            'sales_person': rng.choice(SALES_PEOPLE),
+            'photo_path': rng.choice(photos)
+        })
+    pd.DataFrame(rows).to_csv(os.path.join(workdir, "data", "inventory.csv"), index=False)
+
+# Resident memory of the current process in KB (Linux only)
+def current_rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+# Find a widget by label
+def find_widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"Widget not found: {label}")
+
+# Run one script interaction and record its latency
+def timed_run(at, latencies):
+    start = time.perf_counter()
+    at.run()
+    latencies.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+# Public visitor: open the catalog and change a few filters
+def visitor_session(rng, timeout, latencies):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_string(VISITOR_SCRIPT, default_timeout=timeout)
+    timed_run(at, latencies)
+
+    for _ in range(rng.randint(2, 4)):
+        selectbox = find_widget(at.selectbox, rng.choice(['Marca', 'Ano', 'Tipo']))
+        selectbox.set_value(rng.choice(selectbox.options))
+        timed_run(at, latencies)
+    return at
+
+# Admin: log in, add a truck, sell a truck and edit a truck
+def admin_session(rng, timeout, latencies):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.session_state.authenticated = True
+    timed_run(at, latencies)
+
+    # Add
+    at.sidebar.radio[0].set_value("Adicionar Caminhão")
+    timed_run(at, latencies)
+    find_widget(at.text_input, "Marca").input(rng.choice(BRANDS))
+    find_widget(at.text_input, "Modelo").input(f"Modelo {rng.randint(1, 20)}")
+    find_widget(at.text_input, "Motor").input(f"{rng.randint(300, 600)} cv")
+    find_widget(at.number_input, "Preço (R$)").set_value(float(rng.randint(80, 900) * 1000))
+    find_widget(at.button, "Adicionar Caminhão").click()
+    timed_run(at, latencies)
+
+    # Sell
+    at.sidebar.radio[0].set_value("Gestão de Inventário")
+    timed_run(at, latencies)
+    find_widget(at.selectbox, "Status").set_value('Disponível')
+    timed_run(at, latencies)
+    edit_ids = [button.key[len("edit_"):] for button in at.button if button.key and button.key.startswith("edit_")]
+    sell_buttons = [button for button in at.button if button.label == "Marcar como Vendido"]
+    if sell_buttons:
+        rng.choice(sell_buttons).click()
+        timed_run(at, latencies)
+
+    # Edit (the edit button only stores the id, so set it directly)
+    if edit_ids:
+        at.session_state.edit_truck_id = rng.choice(edit_ids)
+        at.sidebar.radio[0].set_value("Adicionar Caminhão")
+        timed_run(at, latencies)
+        find_widget(at.text_input, "Motor").input(f"{rng.randint(300, 600)} cv")
+        find_widget(at.button, "Atualizar Caminhão").click()
+        timed_run(at, latencies)
+    return at
+
+# Run one simulated session and collect its measurements
+def run_session(kind, seed, timeout):
+    rng = random.Random(seed)
+    latencies = []
+    error = None
+    rss_before = current_rss_kb()
+    start = time.perf_counter()
+
+    try:
+        at = visitor_session(rng, timeout, latencies) if kind == 'visitor' else admin_session(rng, timeout, latencies)
+        # Measure while the session state is still alive
+        memory_kb = current_rss_kb() - rss_before
+        del at
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        memory_kb = current_rss_kb() - rss_before
+        if os.environ.get("LOAD_TEST_DEBUG"):
+            traceback.print_exc()
+
+    return {
+        'kind': kind,
+        'duration': time.perf_counter() - start,
+        'latencies': latencies,
+        'memory_kb': memory_kb,
+        'error': error
+    }
+
+# Prepare a worker: silence Streamlit's "no runtime" warnings, then pay the one-time
+# imports and a first script run so they are not counted in the measured session
+def init_worker(timeout):
+    from streamlit import logger
+    from streamlit.testing.v1 import AppTest
+    import plotly.express  # noqa: F401
+    logger.set_log_level("error")
+
+    AppTest.from_string(VISITOR_SCRIPT, default_timeout=timeout).run()
+
+# Value at a percentile (nearest rank)
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+# Summarize the session results
+def summarize(results, wall_time, concurrency):
+    # Rates use the measured session time spread over the concurrent slots, so worker
+    # startup (a new process per session) is not counted against throughput
+    session_time = sum(r['duration'] for r in results) / concurrency
+    summary = {'wall_time': wall_time, 'session_time': session_time, 'sessions': len(results), 'kinds': {}}
+
+    for kind in ['all', 'visitor', 'admin']:
+        kind_results = [r for r in results if kind == 'all' or r['kind'] == kind]
+        if not kind_results:
+            continue
+
+        latencies = [latency for r in kind_results for latency in r['latencies']]
+        errors = [r for r in kind_results if r['error']]
+        memory = [r['memory_kb'] for r in kind_results]
+        summary['kinds'][kind] = {
+            'sessions': len(kind_results),
+            'interactions': len(latencies),
+            'sessions_per_second': len(kind_results) / session_time,
+            'interactions_per_second': len(latencies) / session_time,
+            'latency': {f"p{p}": percentile(latencies, p) for p in PERCENTILES},
+            'latency_max': max(latencies, default=0.0),
+            'memory_kb_mean': sum(memory) / len(memory),
+            'memory_kb_max': max(memory),
+            'error_rate': len(errors) / len(kind_results),
+            'errors': sorted({r['error'] for r in errors})
+        }
+    return summary
+
+# Print the summary as a table
+def print_summary(summary):
+    print(f"\n{summary['sessions']} sessions in {summary['wall_time']:.1f}s "
+          f"({summary['session_time']:.1f}s of session time per concurrent slot)\n")
+    header = f"{'':8} {'sess/s':>7} {'req/s':>7} " + " ".join(f"{'p' + str(p):>7}" for p in PERCENTILES) + f" {'max':>7} {'mem/sess':>10} {'errors':>7}"
+    print(header)
+    print("-" * len(header))
+    for kind, stats in summary['kinds'].items():
+        latencies = " ".join(f"{stats['latency'][f'p{p}'] * 1000:6.0f}ms" for p in PERCENTILES)
+        print(f"{kind:8} {stats['sessions_per_second']:7.2f} {stats['interactions_per_second']:7.2f} {latencies} "
+              f"{stats['latency_max'] * 1000:5.0f}ms {stats['memory_kb_mean'] / 1024:7.1f} MB {stats['error_rate']:7.1%}")
+
+    for error in summary['kinds']['all']['errors']:
+        print(f"  error: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the truck inventory app")
+    parser.add_argument("--sessions", type=int, default=40, help="total number of simulated sessions")
+    parser.add_argument("--concurrency", type=int, default=8, help="sessions running at the same time")
+    parser.add_argument("--admin-ratio", type=float, default=0.2, help="fraction of sessions that are admins")
+    parser.add_argument("--trucks", type=int, default=200, help="size of the generated inventory")
+    parser.add_argument("--sold-ratio", type=float, default=0.3, help="fraction of generated trucks already sold")
+    parser.add_argument("--timeout", type=float, default=60, help="timeout of a single script run, in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--max-p95", type=float, help="fail if the p95 latency (seconds) is above this")
+    parser.add_argument("--max-error-rate", type=float, help="fail if the error rate is above this")
+    args = parser.parse_args()
+
+    # AppTest replaces __main__, so workers must find the session code by module name
+    import load_test
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="truck_load_test_")
+    cwd = os.getcwd()
+
+    try:
+        generate_inventory(workdir, args.trucks, args.sold_ratio, args.seed)
+        os.chdir(workdir)
+        # Also runs the first-run migrations and snapshots before anything is measured
+        load_test.init_worker(args.timeout)
+
+        kinds = ['admin' if rng.random() < args.admin_ratio else 'visitor' for _ in range(args.sessions)]
+        start = time.perf_counter()
+        # A new worker per session, so its RSS growth is the memory of that session alone
+        with ProcessPoolExecutor(max_workers=args.concurrency, initializer=load_test.init_worker,
+                                 initargs=(args.timeout,), max_tasks_per_child=1) as executor:
+            futures = [executor.submit(load_test.run_session, kind, args.seed + i, args.timeout) for i, kind in enumerate(kinds)]
+            results = [future.result() for future in futures]
+        wall_time = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = summarize(results, wall_time, args.concurrency)
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    # Capacity gates
+    overall = summary['kinds']['all']
+    failed = False
+    if args.max_p95 is not None and overall['latency']['p95'] > args.max_p95:
+        print(f"\nFAIL: p95 latency {overall['latency']['p95']:.3f}s is above {args.max_p95:.3f}s")
+        failed = True
+    if args.max_error_rate is not None and overall['error_rate'] > args.max_error_rate:
+        print(f"\nFAIL: error rate {overall['error_rate']:.1%} is above {args.max_error_rate:.1%}")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())